@@ -10,11 +10,38 @@ Basic Structure
 - Adapter implements the target interface and translates the requests from the client to the adaptee
 """
 
+import itertools
+
+import numpy as np
+
 
 class EuropeanSocket:
     def provide_220v(self):
         return "Providing 220V"
 
+    def read_220v(self, count, rng=None, out=None):
+        """Return `count` voltage readings as one array, filling `out` when given."""
+        rng = rng or np.random.default_rng()
+        if out is None:
+            readings = rng.standard_normal(count)
+        elif len(out) < count:
+            raise ValueError(f"out holds {len(out)} readings, {count} requested")
+        else:
+            readings = rng.standard_normal(out=out[:count])
+        readings *= 2.0
+        readings += 220.0
+        return readings
+
+    def stream_220v(self, chunk_size=4096, seed=None, reuse_buffer=False):
+        """
+        Yield an unbounded sequence of reading chunks. With reuse_buffer=True every
+        chunk refills the same array, so a chunk is only valid until the next one.
+        """
+        rng = np.random.default_rng(seed)
+        buffer = np.empty(chunk_size) if reuse_buffer else None
+        while True:
+            yield self.read_220v(chunk_size, rng, out=buffer)
+
 
 class AmericanSocket:
     def provide_110v(self):
@@ -31,6 +58,84 @@ class SocketAdapter(AmericanSocket):
         return "Providing 110V"
 
 
+def linear_curve(ratio=110 / 220):
+    def convert(readings, out=None):
+        return np.multiply(readings, ratio, out=out)
+
+    return convert
+
+
+def piecewise_curve(input_volts, output_volts):
+    """
+    Interpolate between (input, output) calibration points, e.g. to model a saturating
+    transformer. np.interp has no `out` argument, so each call allocates one temporary.
+    """
+    input_volts = np.asarray(input_volts, dtype=float)
+    output_volts = np.asarray(output_volts, dtype=float)
+
+    def convert(readings, out=None):
+        result = np.interp(readings, input_volts, output_volts)
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
+    return convert
+
+
+class BatchAmericanSocket:
+    def provide_110v_batch(self, count):
+        pass
+
+    def convert_stream(self, chunks, reuse_buffer=False):
+        pass
+
+    def stream_110v(self, chunk_size=4096, limit=None, seed=None, reuse_buffer=False):
+        pass
+
+
+class BatchSocketAdapter(BatchAmericanSocket):
+    """Converts whole arrays of readings in one vectorized step, no per-reading work."""
+
+    def __init__(self, european_socket: EuropeanSocket, curve=None):
+        self.european_socket = european_socket
+        self.curve = curve or linear_curve()
+
+    def convert(self, readings, out=None):
+        return self.curve(np.asarray(readings, dtype=float), out=out)
+
+    def provide_110v_batch(self, count):
+        return self.convert(self.european_socket.read_220v(count))
+
+    def convert_stream(self, chunks, reuse_buffer=False):
+        """
+        Convert any (possibly unbounded) iterable of reading chunks, e.g. a sensor feed.
+        With reuse_buffer=True results go into one output array that is reused while
+        the chunk shape stays the same, so a yielded chunk is overwritten by the next
+        one; copy it if you need to keep it.
+        """
+        out = None
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=float)
+            if not reuse_buffer:
+                yield self.curve(chunk)
+                continue
+            if out is None or out.shape != chunk.shape:
+                out = np.empty_like(chunk)
+            yield self.curve(chunk, out=out)
+
+    def stream_110v(self, chunk_size=4096, limit=None, seed=None, reuse_buffer=False):
+        """
+        Stream the socket's own readings through convert_stream. reuse_buffer=True
+        avoids allocating per chunk, but then every yielded chunk is the same array,
+        e.g. list(stream_110v(limit=3, reuse_buffer=True)) holds the last chunk 3 times.
+        """
+        chunks = self.european_socket.stream_220v(chunk_size, seed, reuse_buffer)
+        if limit is not None:
+            chunks = itertools.islice(chunks, limit)
+        return self.convert_stream(chunks, reuse_buffer)
+
+
 def charge_device(socket: AmericanSocket):
     print(socket.provide_110v())
 
@@ -41,3 +146,17 @@ if __name__ == "__main__":
     adapter = SocketAdapter(european_socket)
 
     charge_device(adapter)
+
+    batch_adapter = BatchSocketAdapter(european_socket)
+    print(f"Batch mean: {batch_adapter.provide_110v_batch(1_000_000).mean():.1f}V")
+
+    saturating = BatchSocketAdapter(
+        european_socket, piecewise_curve([0, 200, 240], [0, 110, 115])
+    )
+    stream = saturating.stream_110v(limit=100, reuse_buffer=True)
+    peak = max(chunk.max() for chunk in stream)
+    print(f"Streamed peak: {peak:.1f}V")
+
+    sensor_feed = (np.full(1024, volts) for volts in (210.0, 220.0, 230.0))
+    means = [chunk.mean() for chunk in batch_adapter.convert_stream(sensor_feed)]
+    print(f"Sensor feed means: {[round(float(m), 1) for m in means]}")
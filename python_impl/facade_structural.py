@@ -7,6 +7,10 @@ Basic Structure
 - Client uses the facade to interact with the subsystem
 """
 
+import itertools
+import threading
+import time
+
 
 class PaymentGateway:
     def process_payment(self, amount):
@@ -23,6 +27,135 @@ class InventorySystem:
         print(f"Reserving product {product_id} in inventory...")
         return True
 
+    def check_and_reserve(self, product_id):
+        return self.check_stock(product_id) and self.reserve_product(product_id)
+
+    def release_product(self, product_id):
+        print(f"Releasing product {product_id} back to inventory...")
+
+
+class StockCache:
+    """
+    In-process stock cache with short TTLs; sold-out items are cached negatively.
+    Every write carries a version from ShardedStockCounter, and a write older than
+    the entry already cached is dropped, so a late sold-out write can't hide a restock.
+    """
+
+    def __init__(self, ttl=0.5, negative_ttl=2.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = {}
+        self._write_lock = threading.Lock()
+
+    def get(self, product_id):
+        entry = self._entries.get(product_id)
+        if entry is None:
+            return None
+        quantity, expires_at, _ = entry
+        if time.monotonic() >= expires_at:
+            return None
+        return quantity
+
+    def put(self, product_id, quantity, version):
+        ttl = self.ttl if quantity > 0 else self.negative_ttl
+        with self._write_lock:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry[2] > version:
+                return
+            self._entries[product_id] = (quantity, time.monotonic() + ttl, version)
+
+    def is_sold_out(self, product_id):
+        return self.get(product_id) == 0
+
+
+class ShardedStockCounter:
+    """
+    Each product's stock is split into one sub-counter per shard, each behind its own
+    lock, so concurrent reservations of the same hot product rarely wait on each other.
+    """
+
+    def __init__(self, num_shards=16):
+        self.num_shards = num_shards
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        self._counts = {}
+        self._cursor = itertools.count()
+        self._versions = itertools.count(1)
+
+    def _sub_counters(self, product_id):
+        counts = self._counts.get(product_id)
+        if counts is None:
+            counts = self._counts.setdefault(product_id, [0] * self.num_shards)
+        return counts
+
+    def next_version(self):
+        return next(self._versions)
+
+    def available(self, product_id):
+        return sum(self._counts.get(product_id, ()))
+
+    def add(self, product_id, quantity):
+        """Spread the stock evenly over the shards; returns the last write's version."""
+        counts = self._sub_counters(product_id)
+        share, extra = divmod(quantity, self.num_shards)
+        version = None
+        for index, lock in enumerate(self._locks):
+            with lock:
+                counts[index] += share + (index < extra)
+                version = self.next_version()
+        return version
+
+    def try_reserve(self, product_id, quantity=1):
+        """
+        Take stock from one shard, starting round-robin and falling back to the others.
+        Returns (reserved, version); a failed attempt's version predates the whole scan.
+        """
+        counts = self._sub_counters(product_id)
+        version = self.next_version()
+        start = next(self._cursor)
+        for offset in range(self.num_shards):
+            index = (start + offset) % self.num_shards
+            with self._locks[index]:
+                if counts[index] >= quantity:
+                    counts[index] -= quantity
+                    return True, self.next_version()
+        return False, version
+
+
+class CachedInventorySystem(InventorySystem):
+    def __init__(self, stock=None, num_shards=16, cache=None):
+        self.counter = ShardedStockCounter(num_shards)
+        self.cache = cache if cache is not None else StockCache()
+        for product_id, quantity in (stock or {}).items():
+            self.counter.add(product_id, quantity)
+
+    def restock(self, product_id, quantity):
+        version = self.counter.add(product_id, quantity)
+        self.cache.put(product_id, self.counter.available(product_id), version)
+
+    def check_stock(self, product_id):
+        quantity = self.cache.get(product_id)
+        if quantity is None:
+            version = self.counter.next_version()
+            quantity = self.counter.available(product_id)
+            self.cache.put(product_id, quantity, version)
+        return quantity > 0
+
+    def reserve_product(self, product_id):
+        return self.check_and_reserve(product_id)
+
+    def check_and_reserve(self, product_id):
+        if self.cache.is_sold_out(product_id):
+            return False
+        # Successful reservations leave the cache alone so hot products never
+        # queue on its write lock; only a sold-out result is written back
+        reserved, version = self.counter.try_reserve(product_id)
+        if not reserved:
+            self.cache.put(product_id, 0, version)
+        return reserved
+
+    def release_product(self, product_id):
+        self.restock(product_id, 1)
+
 
 class EmailService:
     def send_email(self, email, message):
@@ -36,27 +169,25 @@ class ShippingService:
 
 
 class CheckoutFacade:
-    def __init__(self):
+    def __init__(self, inventory_system: InventorySystem = None):
         self.payment_gateway = PaymentGateway()
-        self.inventory_system = InventorySystem()
+        self.inventory_system = inventory_system or InventorySystem()
         self.email_service = EmailService()
         self.shipping_service = ShippingService()
 
     def complete_checkout(self, product_id, amount, email, shipping_address):
-        if not self.inventory_system.check_stock(product_id):
+        if not self.inventory_system.check_and_reserve(product_id):
             print("Product is out of stock.")
             return False
 
         if not self.payment_gateway.process_payment(amount):
             print("Payment failed.")
-            return False
-
-        if not self.inventory_system.reserve_product(product_id):
-            print("Could not reserve the product.")
+            self.inventory_system.release_product(product_id)
             return False
 
         if not self.shipping_service.create_shipment(product_id, shipping_address):
             print("Could not create the shipment.")
+            self.inventory_system.release_product(product_id)
             return False
 
         self.email_service.send_email(
@@ -77,3 +208,7 @@ if __name__ == "__main__":
     shipping_address = "Mars"
 
     checkout_facade.complete_checkout(product_id, amount, email, shipping_address)
+
+    cached_checkout = CheckoutFacade(CachedInventorySystem({product_id: 1}))
+    cached_checkout.complete_checkout(product_id, amount, email, shipping_address)
+    cached_checkout.complete_checkout(product_id, amount, email, shipping_address)
@@ -9,7 +9,12 @@ Basic Structure
 - Concrete state classes
 """
 
+import heapq
+import itertools
+import random
+import time
 from abc import ABC, abstractmethod
+from array import array
 
 
 class ElevatorState(ABC):
@@ -29,98 +34,643 @@ class ElevatorState(ABC):
     def move(self, elevator):
         pass
 
+    # Hooks for ElevatorBankSimulator, which drives each SimulatedCar through these
+    # same state objects; a state only overrides the simulator events it reacts to
+    def add_stop(self, simulator, car, floor, now):
+        car.stops |= 1 << floor
+
+    def arrive(self, simulator, car, now):
+        pass
+
+    def doors_timeout(self, simulator, car, now):
+        pass
+
 
 class Elevator:
-    def __init__(self) -> None:
+    """
+    Context for the elevator states. The classic mode dispatches through the state
+    objects; table_driven=True looks each (state, event) pair up in TRANSITIONS instead.
+    Both modes record the same state_log for the same calls. flyweight=False builds a
+    new state object on every transition, as the original implementation did.
+    """
+
+    __slots__ = (
+        "current_floor",
+        "requested_floor",
+        "state",
+        "verbose",
+        "table_driven",
+        "flyweight",
+        "state_log",
+    )
+
+    def __init__(self, verbose=True, table_driven=False, flyweight=True) -> None:
         self.current_floor = 0
         self.requested_floor = None
-        self.state = IdleState()
+        self.state = IDLE
+        self.verbose = verbose
+        self.table_driven = table_driven
+        self.flyweight = flyweight
+        self.state_log = array("B", [IDLE.code])
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
 
     def set_state(self, state):
-        self.state = state
+        if state.code != self.state.code:
+            self.state = state if self.flyweight else type(state)()
+            self.state_log.append(state.code)
+
+    def fire(self, event, floor=None):
+        while event is not None:
+            next_state, action, follow_up = TRANSITIONS[self.state.code][event]
+            if action is not None:
+                next_state = action(self, floor) or next_state
+            if self.verbose:
+                old_name = type(self.state).__name__
+                new_name = type(next_state).__name__
+                print(f"{EVENT_NAMES[event]}: {old_name} -> {new_name}")
+            self.set_state(next_state)
+            event = follow_up
 
     def request_floor(self, floor):
-        self.state.request_floor(self, floor)
+        if self.table_driven:
+            self.fire(REQUEST_FLOOR, floor)
+        else:
+            self.state.request_floor(self, floor)
 
     def open_doors(self):
-        self.state.open_doors(self)
+        if self.table_driven:
+            self.fire(OPEN_DOORS)
+        else:
+            self.state.open_doors(self)
 
     def close_doors(self):
-        self.state.close_doors(self)
+        if self.table_driven:
+            self.fire(CLOSE_DOORS)
+        else:
+            self.state.close_doors(self)
 
     def move(self):
-        self.state.move(self)
+        if self.table_driven:
+            self.fire(MOVE)
+        else:
+            self.state.move(self)
 
 
 class IdleState(ElevatorState):
+    code = 0
+
     def request_floor(self, elevator: Elevator, floor):
-        print(f"Requesting floor {floor} from idle state.")
+        elevator.log(f"Requesting floor {floor} from idle state.")
         if floor > elevator.current_floor:
-            elevator.set_state(MovingUpState())
+            elevator.set_state(MOVING_UP)
         elif floor < elevator.current_floor:
-            elevator.set_state(MovingDownState())
+            elevator.set_state(MOVING_DOWN)
         elevator.requested_floor = floor
         elevator.move()
 
     def open_doors(self, elevator: Elevator):
-        print(f"Doors are opening.")
-        elevator.set_state(DoorsOpenState())
+        elevator.log(f"Doors are opening.")
+        elevator.set_state(DOORS_OPEN)
 
     def close_doors(self, elevator: Elevator):
-        print("Cannot close doors, they are already closed.")
+        elevator.log("Cannot close doors, they are already closed.")
 
     def move(self, elevator: Elevator):
-        print("Elevator is idle, waiting for floor request.")
+        elevator.log("Elevator is idle, waiting for floor request.")
+
+    def add_stop(self, simulator, car, floor, now):
+        car.stops |= 1 << floor
+        simulator.depart(car, now)
 
 
 class DoorsOpenState(ElevatorState):
+    code = 1
+
     def request_floor(self, elevator: Elevator, floor):
-        print("Cannot request a floor while doors are open.")
+        elevator.log("Cannot request a floor while doors are open.")
 
     def open_doors(self, elevator: Elevator):
-        print(f"Doors are already open.")
+        elevator.log(f"Doors are already open.")
 
     def close_doors(self, elevator: Elevator):
-        print(f"Doors are now closed.")
-        elevator.set_state(IdleState())
+        elevator.log(f"Doors are now closed.")
+        elevator.set_state(IDLE)
 
     def move(self, elevator: Elevator):
-        print(f"Elevator cannot move while the doors are open.")
+        elevator.log(f"Elevator cannot move while the doors are open.")
+
+    def add_stop(self, simulator, car, floor, now):
+        # A call for the open floor just boards before the doors close
+        if floor != car.floor:
+            car.stops |= 1 << floor
+
+    def doors_timeout(self, simulator, car, now):
+        if car.pickups[car.floor]:
+            simulator.board(car, now)
+        car.set_state(IDLE)
+        simulator.depart(car, now)
 
 
 class MovingUpState(ElevatorState):
+    code = 2
+
     def request_floor(self, elevator: Elevator, floor):
-        print(f"Already moving up, cannot change destination to floor {floor}.")
+        elevator.log(f"Already moving up, cannot change destination to floor {floor}.")
 
     def open_doors(self, elevator: Elevator):
-        print(f"Cannot open doors while moving.")
+        elevator.log(f"Cannot open doors while moving.")
 
     def close_doors(self, elevator: Elevator):
-        print(f"Doors are already closed.")
+        elevator.log(f"Doors are already closed.")
 
     def move(self, elevator: Elevator):
-        print(f"Moving up to floor {elevator.requested_floor}.")
+        elevator.log(f"Moving up to floor {elevator.requested_floor}.")
         elevator.current_floor = elevator.requested_floor
-        elevator.set_state(IdleState())
+        elevator.set_state(IDLE)
         elevator.open_doors()
 
+    def add_stop(self, simulator, car, floor, now):
+        car.stops |= 1 << floor
+        simulator.stop_on_the_way(car, floor, now)
+
+    def arrive(self, simulator, car, now):
+        car.floor = car.target
+        car.target = None
+        if car.stops >> car.floor & 1:
+            simulator.open_doors(car, now)
+        else:
+            simulator.depart(car, now)
+
 
 class MovingDownState(ElevatorState):
+    code = 3
+
     def request_floor(self, elevator: Elevator, floor):
-        print(f"Already moving down, cannot change destination to floor {floor}.")
+        elevator.log(
+            f"Already moving down, cannot change destination to floor {floor}."
+        )
 
     def open_doors(self, elevator: Elevator):
-        print(f"Cannot open doors while moving.")
+        elevator.log(f"Cannot open doors while moving.")
 
     def close_doors(self, elevator: Elevator):
-        print(f"Doors are already closed.")
+        elevator.log(f"Doors are already closed.")
 
     def move(self, elevator: Elevator):
-        print(f"Moving down to floor {elevator.requested_floor}.")
+        elevator.log(f"Moving down to floor {elevator.requested_floor}.")
         elevator.current_floor = elevator.requested_floor
-        elevator.set_state(IdleState())
+        elevator.set_state(IDLE)
         elevator.open_doors()
 
+    def add_stop(self, simulator, car, floor, now):
+        car.stops |= 1 << floor
+        simulator.stop_on_the_way(car, floor, now)
+
+    def arrive(self, simulator, car, now):
+        car.floor = car.target
+        car.target = None
+        if car.stops >> car.floor & 1:
+            simulator.open_doors(car, now)
+        else:
+            simulator.depart(car, now)
+
+
+# The states hold no data, so every elevator shares one instance of each (flyweights)
+IDLE = IdleState()
+DOORS_OPEN = DoorsOpenState()
+MOVING_UP = MovingUpState()
+MOVING_DOWN = MovingDownState()
+STATES = (IDLE, DOORS_OPEN, MOVING_UP, MOVING_DOWN)
+
+REQUEST_FLOOR, OPEN_DOORS, CLOSE_DOORS, MOVE = range(4)
+EVENT_NAMES = ("request_floor", "open_doors", "close_doors", "move")
+
+
+def _start_trip(elevator: Elevator, floor):
+    elevator.requested_floor = floor
+    if floor > elevator.current_floor:
+        return MOVING_UP
+    if floor < elevator.current_floor:
+        return MOVING_DOWN
+    return IDLE
+
+
+def _arrive(elevator: Elevator, floor):
+    elevator.current_floor = elevator.requested_floor
+
+
+# (state, event) -> (next state, action, follow-up event); an action may return the
+# next state itself, and the follow-up mirrors the nested call the state class makes
+_TRANSITION_SPEC = {
+    (IDLE, REQUEST_FLOOR): (IDLE, _start_trip, MOVE),
+    (IDLE, OPEN_DOORS): (DOORS_OPEN, None, None),
+    (DOORS_OPEN, CLOSE_DOORS): (IDLE, None, None),
+    (MOVING_UP, MOVE): (IDLE, _arrive, OPEN_DOORS),
+    (MOVING_DOWN, MOVE): (IDLE, _arrive, OPEN_DOORS),
+}
+
+# Precomputed as TRANSITIONS[state.code][event]; unlisted pairs keep the current state
+TRANSITIONS = tuple(
+    tuple(
+        _TRANSITION_SPEC.get((state, event), (state, None, None)) for event in range(4)
+    )
+    for state in STATES
+)
+
+
+def benchmark_fleet(num_elevators=10_000, trips_per_elevator=50, seed=0):
+    """Drive a fleet of silent elevators in each mode and return events/sec for each."""
+    rng = random.Random(seed)
+    floors = [rng.randint(0, 30) for _ in range(trips_per_elevator)]
+    events = num_elevators * trips_per_elevator * 2
+    modes = {
+        "allocating": dict(flyweight=False),
+        "flyweight": dict(),
+        "table_driven": dict(table_driven=True),
+    }
+
+    results = {}
+    for mode, options in modes.items():
+        fleet = [Elevator(verbose=False, **options) for _ in range(num_elevators)]
+        started = time.perf_counter()
+        for elevator in fleet:
+            for floor in floors:
+                elevator.request_floor(floor)
+                elevator.close_doors()
+        elapsed = time.perf_counter() - started
+        results[mode] = events / elapsed
+    return results
+
+
+class SimulatedCar:
+    """
+    Context for ElevatorBankSimulator: an elevator car that keeps a queue of stops
+    instead of one floor and hands every simulator event to its current state.
+    Stops are a bitmask (bit n set = stop at floor n) so finding the next stop in
+    either direction is a couple of integer operations rather than a scan.
+    """
+
+    __slots__ = (
+        "car_id",
+        "floor",
+        "direction",
+        "target",
+        "depart_time",
+        "version",
+        "state",
+        "pickups",
+        "dropoffs",
+        "stops",
+    )
+
+    def __init__(self, car_id, num_floors, floor=0):
+        self.car_id = car_id
+        self.floor = floor
+        self.direction = 0
+        self.target = None
+        self.depart_time = 0.0
+        self.version = 0
+        self.state = IDLE
+        self.pickups = [[] for _ in range(num_floors)]
+        self.dropoffs = [[] for _ in range(num_floors)]
+        self.stops = 0
+
+    def set_state(self, state):
+        self.state = state
+
+
+def _nearest_above(stops, floor):
+    above = stops >> (floor + 1)
+    return floor + (above & -above).bit_length() if above else None
+
+
+def _nearest_below(stops, floor):
+    below = stops & ((1 << floor) - 1)
+    return below.bit_length() - 1 if below else None
+
+
+class DispatchStrategy(ABC):
+    """Decides which car answers a hall call and which way a car sweeps next."""
+
+    @abstractmethod
+    def assign(self, cars, floor, now, simulator):
+        pass
+
+    def next_direction(self, car, top_floor):
+        # LOOK: keep sweeping while stops remain ahead, else head for the nearest stop
+        stops = car.stops
+        if not stops:
+            return 0
+        floor = car.floor
+        above = _nearest_above(stops, floor)
+        below = _nearest_below(stops, floor)
+        if car.direction > 0 and above is not None:
+            return 1
+        if car.direction < 0 and below is not None:
+            return -1
+        if above is None:
+            return -1
+        if below is None:
+            return 1
+        return 1 if above - floor <= floor - below else -1
+
+
+class NearestCarDispatch(DispatchStrategy):
+    def assign(self, cars, floor, now, simulator):
+        floor_time = simulator.floor_time
+        best, best_cost = None, float("inf")
+        for car in cars:
+            if car.target is None:
+                cost = abs(floor - car.floor)
+            else:
+                travelled = car.direction * (now - car.depart_time) / floor_time
+                cost = abs(floor - car.floor - travelled)
+            if cost < best_cost:
+                best, best_cost = car, cost
+        return best
+
+
+class LookDispatch(DispatchStrategy):
+    """Cost is the floors a car travels to the call, turning at its last stop."""
+
+    sweeps_to_terminal = False
+
+    def assign(self, cars, floor, now, simulator):
+        floor_time = simulator.floor_time
+        top_floor = simulator.num_floors - 1
+        sweeps_to_terminal = self.sweeps_to_terminal
+        best, best_cost = None, float("inf")
+        for car in cars:
+            direction = car.direction
+            if car.target is None:
+                offset = floor - car.floor
+                if not direction:
+                    # Idle: nothing to sweep, the cost is just the distance
+                    cost = offset if offset >= 0 else -offset
+                    if cost < best_cost:
+                        best, best_cost = car, cost
+                    continue
+                position = car.floor
+            else:
+                position = car.floor + direction * (now - car.depart_time) / floor_time
+                offset = floor - position
+            if offset * direction >= 0:
+                cost = offset if offset >= 0 else -offset
+                if cost < best_cost:
+                    best, best_cost = car, cost
+                continue
+
+            # The call is behind the car: it must reach its turning floor first
+            stops = car.stops
+            if direction > 0:
+                if sweeps_to_terminal:
+                    turn = top_floor
+                elif stops >> (car.floor + 1):
+                    turn = stops.bit_length() - 1
+                else:
+                    turn = car.floor
+                cost = 2 * turn - position - floor
+            else:
+                below = stops & ((1 << car.floor) - 1)
+                if sweeps_to_terminal:
+                    turn = 0
+                elif below:
+                    turn = (below & -below).bit_length() - 1
+                else:
+                    turn = car.floor
+                cost = position + floor - 2 * turn
+            if cost < best_cost:
+                best, best_cost = car, cost
+        return best
+
+
+class ScanDispatch(LookDispatch):
+    sweeps_to_terminal = True
+
+    def next_direction(self, car, top_floor):
+        # SCAN: run to the terminal floor before turning around
+        if not car.stops:
+            return 0
+        if car.direction > 0 and car.floor < top_floor:
+            return 1
+        if car.direction < 0 and car.floor > 0:
+            return -1
+        return super().next_direction(car, top_floor)
+
+
+class SimulationStats:
+    def __init__(self):
+        self.wait_times = array("d")
+        self.trip_times = array("d")
+        self.dropped = 0
+        self.end_time = 0.0
+
+    def report(self):
+        served = len(self.trip_times)
+        if not served:
+            return {"served": 0, "dropped": self.dropped}
+        waits = sorted(self.wait_times)
+        throughput = served * 3600 / self.end_time if self.end_time else 0.0
+        return {
+            "served": served,
+            "dropped": self.dropped,
+            "mean_wait": sum(waits) / len(waits),
+            "p95_wait": waits[int(len(waits) * 0.95)],
+            "max_wait": waits[-1],
+            "mean_trip": sum(self.trip_times) / served,
+            "throughput_per_hour": throughput,
+        }
+
+
+class ElevatorBankSimulator:
+    """
+    Discrete-event simulation of a bank of elevators driven by a heapq event queue.
+    Hall calls are merged in from the sorted request stream rather than queued.
+    Cars jump straight to their next stop, and an outdated arrival event is
+    dropped by its version number when a closer stop is added on the way.
+    Which event does what is decided by each car's state object.
+    """
+
+    CAR_ARRIVE, DOORS_CLOSE = range(2)
+
+    def __init__(
+        self,
+        num_cars,
+        num_floors,
+        strategy: DispatchStrategy,
+        floor_time=1.5,
+        door_time=4.0,
+    ):
+        self.num_floors = num_floors
+        self.strategy = strategy
+        self.floor_time = floor_time
+        self.door_time = door_time
+        self.cars = [SimulatedCar(i, num_floors) for i in range(num_cars)]
+        self.stats = SimulationStats()
+        self._events = []
+
+    def _push(self, when, car, kind):
+        heapq.heappush(self._events, (when, car.car_id, car.version, kind))
+
+    def run(self, requests):
+        """
+        Run until every request is delivered. Requests are (time, origin, destination)
+        tuples sorted by time; same-floor calls are counted as dropped.
+        """
+        CAR_ARRIVE = self.CAR_ARRIVE
+        cars = self.cars
+        events = self._events
+        heappop = heapq.heappop
+        assign = self.strategy.assign
+        stats = self.stats
+        requests = iter(requests)
+        request = next(requests, None)
+
+        now = 0.0
+        while events or request is not None:
+            if request is not None and (not events or request[0] <= events[0][0]):
+                now, origin, destination = request
+                request = next(requests, None)
+                if origin == destination:
+                    stats.dropped += 1
+                    continue
+                car = assign(cars, origin, now, self)
+                car.pickups[origin].append((now, destination))
+                if not car.stops >> origin & 1:
+                    car.state.add_stop(self, car, origin, now)
+                continue
+
+            now, car_id, version, kind = heappop(events)
+            car = cars[car_id]
+            if version != car.version:
+                continue
+            if kind == CAR_ARRIVE:
+                car.state.arrive(self, car, now)
+            else:
+                car.state.doors_timeout(self, car, now)
+
+        stats.end_time = now
+        return stats
+
+    def stop_on_the_way(self, car, floor, now):
+        """Retarget a moving car if the new stop lies between it and its target."""
+        direction = car.direction
+        distance = (floor - car.floor) * direction
+        if (
+            distance > 0
+            and (floor - car.target) * direction < 0
+            and distance * self.floor_time >= now - car.depart_time
+        ):
+            car.target = floor
+            car.version += 1
+            arrival = car.depart_time + distance * self.floor_time
+            self._push(arrival, car, self.CAR_ARRIVE)
+
+    def depart(self, car, now):
+        floor = car.floor
+        if car.stops >> floor & 1:
+            self.open_doors(car, now)
+            return
+
+        direction = self.strategy.next_direction(car, self.num_floors - 1)
+        if not direction:
+            car.direction = 0
+            car.target = None
+            car.set_state(IDLE)
+            return
+
+        stops = car.stops
+        if direction > 0:
+            above = stops >> (floor + 1)
+            if above:
+                target = floor + (above & -above).bit_length()
+            else:
+                target = self.num_floors - 1
+        else:
+            below = stops & ((1 << floor) - 1)
+            target = below.bit_length() - 1 if below else 0
+
+        car.direction = direction
+        car.target = target
+        car.depart_time = now
+        car.version += 1
+        car.set_state(MOVING_UP if direction > 0 else MOVING_DOWN)
+        self._push(now + abs(target - floor) * self.floor_time, car, self.CAR_ARRIVE)
+
+    def open_doors(self, car, now):
+        car.set_state(DOORS_OPEN)
+        self.board(car, now)
+        self._push(now + self.door_time, car, self.DOORS_CLOSE)
+
+    def board(self, car, now):
+        floor = car.floor
+        car.stops &= ~(1 << floor)
+
+        riders = car.dropoffs[floor]
+        if riders:
+            trip_times = self.stats.trip_times
+            for requested_at in riders:
+                trip_times.append(now - requested_at)
+            riders.clear()
+
+        waiting = car.pickups[floor]
+        if waiting:
+            wait_times = self.stats.wait_times
+            dropoffs = car.dropoffs
+            for requested_at, destination in waiting:
+                wait_times.append(now - requested_at)
+                dropoffs[destination].append(requested_at)
+                car.stops |= 1 << destination
+            waiting.clear()
+
+
+def generate_requests(
+    num_requests, num_floors, arrivals_per_second=1.0, lobby_share=0.5, seed=None
+):
+    """
+    Return (time, origin, destination) hall calls with Poisson arrivals and a busy
+    lobby, pre-generated into a list. The destination never equals the origin.
+    """
+    rng = random.Random(seed)
+    uniform = rng.random
+    expovariate = rng.expovariate
+    upper_floors = num_floors - 1
+    requests = []
+    append = requests.append
+    now = 0.0
+    for _ in range(num_requests):
+        now += expovariate(arrivals_per_second)
+        if uniform() < lobby_share:
+            append((now, 0, 1 + int(uniform() * upper_floors)))
+            continue
+        origin = 1 + int(uniform() * upper_floors)
+        if uniform() < lobby_share:
+            append((now, origin, 0))
+            continue
+        # Pick among the other num_floors - 1 floors, skipping over the origin
+        destination = int(uniform() * upper_floors)
+        if destination >= origin:
+            destination += 1
+        append((now, origin, destination))
+    return requests
+
+
+def compare_dispatch_strategies(num_requests=10_000, num_cars=8, num_floors=30, seed=7):
+    """Replay one request stream under each dispatch strategy and print the stats."""
+    requests = generate_requests(
+        num_requests, num_floors, arrivals_per_second=0.5, seed=seed
+    )
+    for strategy in (NearestCarDispatch(), LookDispatch(), ScanDispatch()):
+        simulator = ElevatorBankSimulator(num_cars, num_floors, strategy)
+        started = time.perf_counter()
+        stats = simulator.run(requests)
+        elapsed = time.perf_counter() - started
+        report = ", ".join(f"{k}={round(v, 1)}" for k, v in stats.report().items())
+        print(f"{type(strategy).__name__}: {report} ({elapsed:.2f}s)")
+
 
 if __name__ == "__main__":
     elevator = Elevator()
@@ -128,3 +678,14 @@ if __name__ == "__main__":
     elevator.close_doors()
     elevator.request_floor(1)
     elevator.close_doors()
+
+    table_elevator = Elevator(table_driven=True)
+    table_elevator.request_floor(3)
+    table_elevator.close_doors()
+    state_names = [type(STATES[code]).__name__ for code in table_elevator.state_log]
+    print(f"State log: {state_names}")
+
+    for mode, rate in benchmark_fleet(num_elevators=2_000).items():
+        print(f"{mode}: {rate:,.0f} events/sec")
+
+    compare_dispatch_strategies()